@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timezone
+import hashlib
+import time
+from bisect import bisect_right
 from decimal import Decimal
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException, Query
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response
 
 from app.core.config import settings
 from app.schemas.responses import LiquidationResponse, MarketsResponse, PositionsResponse
+from app.services.cache import AsyncTTLCache
 from app.services.morpho_client import (
     MorphoClient,
     build_market_positions,
@@ -20,6 +25,7 @@ from app.services.morpho_client import (
     normalize_lltv,
     safe_get,
     to_decimal,
+    to_float,
 )
 from app.services.onchain import OnchainClient
 from app.services.rewards_client import RewardsClient
@@ -32,186 +38,220 @@ rewards_client = RewardsClient()
 onchain_client = OnchainClient()
 storage = MongoStorage()
 
-SUPPORTED_CHAIN_IDS = set(settings.chain_configs().keys())
+SUPPORTED_CHAIN_IDS: FrozenSet[int] = frozenset(settings.chain_configs())
 
+# Caps concurrent adapter multicalls across all in-flight requests.
+ONCHAIN_SEMAPHORE = asyncio.Semaphore(8)
 
-def now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+MARKETS_RESPONSE_TTL = 30.0
+MARKETS_CACHE_CONTROL = f"public, max-age={int(MARKETS_RESPONSE_TTL)}"
 
+# Serialized /markets bodies and their ETags, keyed by chain id.
+_markets_responses = AsyncTTLCache()
 
-def validate_chain_id(chain_id: int) -> int:
-    if chain_id not in SUPPORTED_CHAIN_IDS:
-        raise HTTPException(status_code=400, detail="Unsupported chainId")
-    return chain_id
+
+_EMPTY: Dict[str, Any] = {}
+
+_D1, _D100 = Decimal("1"), Decimal("100")
+_RISK_THRESHOLDS = (Decimal("1.2"), Decimal("1.5"), Decimal("2.0"))
+_RISK_LEVELS = ("critical", "risky", "medium", "safe")
+
+
+_ts_cache: Tuple[int, str] = (0, "")
+
+
+def now_iso() -> str:
+    global _ts_cache
+    now = int(time.time())
+    cached = _ts_cache
+    if cached[0] == now:
+        return cached[1]
+    formatted = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+    _ts_cache = (now, formatted)
+    return formatted
 
 
-@router.get("/{address}/positions", response_model=PositionsResponse)
+@router.get("/{address}/positions", responses={200: {"model": PositionsResponse}})
 async def get_positions(address: str, chainId: int = Query(1, alias="chainId")):
-    chain_id = validate_chain_id(chainId)
+    if chainId not in SUPPORTED_CHAIN_IDS:
+        raise HTTPException(status_code=400, detail="Unsupported chainId")
+    chain_id = chainId
+
+    async def load_unclaimed_rewards() -> List[Dict[str, Any]]:
+        rewards_data = await rewards_client.fetch_user_rewards(address)
+        return await rewards_client.build_unclaimed_rewards(rewards_data)
 
-    user_data_task = morpho_client.fetch_user_by_address(chain_id, address)
-    rewards_task = rewards_client.fetch_user_rewards(address)
-    user_data, rewards_data = await asyncio.gather(user_data_task, rewards_task, return_exceptions=True)
+    # Rewards do not depend on the user snapshot, so fetch and build them alongside it.
+    rewards_task = asyncio.create_task(load_unclaimed_rewards())
 
-    if isinstance(user_data, Exception):
+    try:
+        user_data = await morpho_client.fetch_user_by_address(chain_id, address)
+    except Exception:
+        rewards_task.cancel()
         raise HTTPException(status_code=502, detail="Failed to fetch Morpho data")
 
     user = safe_get(user_data, "userByAddress")
     if not user:
+        rewards_task.cancel()
         raise HTTPException(status_code=404, detail="User not found")
 
-    state = safe_get(user, "state", {})
+    state = user.get("state") or _EMPTY
+    vault_v2s_assets_usd = to_float(state.get("vaultV2sAssetsUsd", 0))
+    vaults_assets_usd = to_float(state.get("vaultsAssetsUsd", 0))
+    markets_borrow_usd = to_float(state.get("marketsBorrowAssetsUsd", 0))
+    net_worth_usd = (
+        to_float(state.get("marketsCollateralUsd", 0))
+        - markets_borrow_usd
+        + vault_v2s_assets_usd
+        + vaults_assets_usd
+    )
     summary = {
-        "totalSupplyUsd": format_optional_decimal(
-            to_decimal(safe_get(state, "vaultV2sAssetsUsd", 0))
-            + to_decimal(safe_get(state, "vaultsAssetsUsd", 0))
-        ),
-        "totalBorrowUsd": format_optional_decimal(safe_get(state, "marketsBorrowAssetsUsd", 0)),
-        "netWorthUsd": format_optional_decimal(
-            to_decimal(safe_get(state, "marketsCollateralUsd", 0))
-            - to_decimal(safe_get(state, "marketsBorrowAssetsUsd", 0))
-            + to_decimal(safe_get(state, "vaultV2sAssetsUsd", 0))
-            + to_decimal(safe_get(state, "vaultsAssetsUsd", 0))
-        ),
+        "totalSupplyUsd": f"{vault_v2s_assets_usd + vaults_assets_usd:.2f}",
+        "totalBorrowUsd": f"{markets_borrow_usd:.2f}",
+        "netWorthUsd": f"{net_worth_usd:.2f}",
     }
 
-    vault_positions: List[Dict[str, Any]] = []
-    for v1_position in safe_get(user, "vaultPositions", []) or []:
-        vault_positions.append(await build_vault_position_from_v1(v1_position))
-
-    v2_positions = safe_get(user, "vaultV2Positions", []) or []
-
-    async def fetch_v2_position(position: Dict[str, Any]) -> Dict[str, Any]:
-        vault = safe_get(position, "vault", {})
-        adapters = safe_get(vault, "adapters", {})
-        adapter_items = safe_get(adapters, "items", []) or []
-        adapter_addresses = [safe_get(item, "address") for item in adapter_items if item]
-
-        v1_addresses = await asyncio.gather(
-            *[
-                onchain_client.fetch_morpho_vault_v1(chain_id, addr)
-                for addr in adapter_addresses
-                if addr
-            ],
-            return_exceptions=True,
+    v1_positions = [p or _EMPTY for p in user.get("vaultPositions") or []]
+    v2_positions = [p or _EMPTY for p in user.get("vaultV2Positions") or []]
+
+    def adapter_addresses(position: Dict[str, Any]) -> List[str]:
+        vault = position.get("vault") or _EMPTY
+        adapter_items = (vault.get("adapters") or _EMPTY).get("items") or []
+        return [item["address"].lower() for item in adapter_items if item and item.get("address")]
+
+    async def build_v2_positions() -> List[Dict[str, Any]]:
+        if not v2_positions:
+            return []
+        adapters_by_position = [adapter_addresses(p) for p in v2_positions]
+        # Positions often share adapters; resolve every unique adapter in one multicall.
+        unique_adapters = list(
+            dict.fromkeys(addr for adapters in adapters_by_position for addr in adapters)
         )
-        v1_address = None
-        for result in v1_addresses:
-            if isinstance(result, Exception):
-                continue
-            if result:
-                v1_address = result
-                break
-
-        allocation_data = None
-        if v1_address:
+
+        v1_by_adapter: Dict[str, Optional[str]] = {}
+        if unique_adapters:
+            async with ONCHAIN_SEMAPHORE:
+                v1_by_adapter = await onchain_client.fetch_morpho_vault_v1_batch(
+                    chain_id, unique_adapters
+                )
+        v1_addresses = [
+            next((v1_by_adapter[addr] for addr in adapters if v1_by_adapter.get(addr)), None)
+            for adapters in adapters_by_position
+        ]
+
+        allocations: Dict[str, Dict[str, Any]] = {}
+        if any(v1_addresses):
             try:
-                allocation_data = await morpho_client.fetch_vault_by_address(chain_id, v1_address)
-                allocation_data = safe_get(allocation_data, "vaultByAddress")
+                allocations = await morpho_client.fetch_vaults_by_addresses(chain_id, v1_addresses)
             except Exception:
-                allocation_data = None
+                allocations = {}
 
-        return await build_vault_position_from_v2(position, allocation_data)
+        return await asyncio.gather(
+            *[
+                build_vault_position_from_v2(position, allocations.get(v1_address or ""))
+                for position, v1_address in zip(v2_positions, v1_addresses)
+            ]
+        )
 
-    if v2_positions:
-        v2_results = await asyncio.gather(*[fetch_v2_position(p) for p in v2_positions])
-        vault_positions.extend(v2_results)
+    v1_results, v2_results = await asyncio.gather(
+        asyncio.gather(*[build_vault_position_from_v1(p) for p in v1_positions]),
+        build_v2_positions(),
+    )
+    vault_positions: List[Dict[str, Any]] = [*v1_results, *v2_results]
 
-    market_positions = build_market_positions(safe_get(user, "marketPositions", []) or [])
+    market_positions = build_market_positions(user.get("marketPositions") or [])
 
-    unclaimed_rewards = []
-    if not isinstance(rewards_data, Exception):
-        unclaimed_rewards = await rewards_client.build_unclaimed_rewards(rewards_data)
+    try:
+        unclaimed_rewards = await rewards_task
+    except Exception:
+        unclaimed_rewards = []
 
     payload = {
-        "address": safe_get(user, "address") or address,
+        "address": user.get("address") or address,
         "protocol": "morpho",
         "chainId": chain_id,
         "timestamp": now_iso(),
         "summary": summary,
         "vaultPositions": vault_positions,
-        "marketPositions": [
-            {k: v for k, v in item.items() if k != "_extra"} for item in market_positions
-        ],
+        "marketPositions": market_positions,
         "rewards": {"unclaimedRewards": unclaimed_rewards},
     }
 
     storage.save_snapshot_background("positions", payload)
 
-    return payload
+    return ORJSONResponse(payload)
 
 
-@router.get("/{address}/liquidation", response_model=LiquidationResponse)
+@router.get("/{address}/liquidation", responses={200: {"model": LiquidationResponse}})
 async def get_liquidation(address: str, chainId: int = Query(1, alias="chainId")):
-    chain_id = validate_chain_id(chainId)
+    if chainId not in SUPPORTED_CHAIN_IDS:
+        raise HTTPException(status_code=400, detail="Unsupported chainId")
+    chain_id = chainId
 
     user_data = await morpho_client.fetch_user_by_address(chain_id, address)
     user = safe_get(user_data, "userByAddress")
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    market_positions_raw = safe_get(user, "marketPositions", []) or []
+    market_positions_raw = [p or _EMPTY for p in user.get("marketPositions") or []]
     liquidation_positions: List[Dict[str, Any]] = []
 
+    # Bind hot helpers locally; the loop body runs once per market position.
+    dec = to_decimal
+    fmt = format_decimal
+    fmt_opt = format_optional_decimal
+    append = liquidation_positions.append
+
     for position in market_positions_raw:
-        state = safe_get(position, "state", {})
-        market = safe_get(position, "market", {})
-        loan = safe_get(market, "loanAsset", {})
-        collateral = safe_get(market, "collateralAsset", {})
-
-        health_factor = to_decimal(safe_get(position, "healthFactor", 0))
-        if health_factor >= Decimal("2.0"):
-            risk_level = "safe"
-        elif health_factor >= Decimal("1.5"):
-            risk_level = "medium"
-        elif health_factor >= Decimal("1.2"):
-            risk_level = "risky"
-        else:
-            risk_level = "critical"
-
-        price_variation = to_decimal(safe_get(position, "priceVariationToLiquidationPrice", 0))
-        price_drop_percent = format_decimal(price_variation * Decimal("100"), 2) + "%"
-
-        collateral_price = to_decimal(safe_get(collateral, "priceUsd", 0))
-        liquidation_price = collateral_price * (Decimal("1") + price_variation)
-
-        collateral_decimals = int(safe_get(collateral, "decimals", 18) or 18)
-        loan_decimals = int(safe_get(loan, "decimals", 18) or 18)
-        collateral_amount = to_decimal(safe_get(state, "collateral", 0)) / (
-            Decimal(10) ** collateral_decimals
-        )
-        borrow_amount = to_decimal(safe_get(state, "borrowAssets", 0)) / (
-            Decimal(10) ** loan_decimals
-        )
+        state = position.get("state") or _EMPTY
+        market = position.get("market") or _EMPTY
+        loan = market.get("loanAsset") or _EMPTY
+        collateral = market.get("collateralAsset") or _EMPTY
+        collateral_symbol = collateral.get("symbol")
+        loan_symbol = loan.get("symbol")
+
+        health_factor = dec(position.get("healthFactor", 0))
+        risk_level = _RISK_LEVELS[bisect_right(_RISK_THRESHOLDS, health_factor)]
 
-        liquidation_positions.append(
+        price_variation = dec(position.get("priceVariationToLiquidationPrice", 0))
+        price_drop_percent = fmt(price_variation * _D100, 2) + "%"
+
+        collateral_price = dec(collateral.get("priceUsd", 0))
+        liquidation_price = collateral_price * (_D1 + price_variation)
+
+        collateral_decimals = int(collateral.get("decimals", 18) or 18)
+        loan_decimals = int(loan.get("decimals", 18) or 18)
+        collateral_amount = dec(state.get("collateral", 0)).scaleb(-collateral_decimals)
+        borrow_amount = dec(state.get("borrowAssets", 0)).scaleb(-loan_decimals)
+
+        append(
             {
-                "marketId": safe_get(market, "uniqueKey"),
-                "healthFactor": format_decimal(health_factor, 2),
+                "marketId": market.get("uniqueKey"),
+                "healthFactor": fmt(health_factor, 2),
                 "riskLevel": risk_level,
-                "lltv": normalize_lltv(safe_get(market, "lltv"), 2),
+                "lltv": normalize_lltv(market.get("lltv"), 2),
                 "liquidationPrice": {
-                    "collateralAsset": safe_get(collateral, "symbol"),
-                    "debtAsset": safe_get(loan, "symbol"),
-                    "currentPrice": format_decimal(collateral_price, 2),
-                    "liquidationPrice": format_decimal(liquidation_price, 2),
+                    "collateralAsset": collateral_symbol,
+                    "debtAsset": loan_symbol,
+                    "currentPrice": fmt(collateral_price, 2),
+                    "liquidationPrice": fmt(liquidation_price, 2),
                     "priceDropToLiquidation": price_drop_percent,
                 },
                 "collateralAtRisk": {
-                    "asset": safe_get(collateral, "symbol"),
-                    "amount": format_decimal(collateral_amount, collateral_decimals),
-                    "amountUsd": format_optional_decimal(safe_get(state, "collateralUsd", 2), 2),
+                    "asset": collateral_symbol,
+                    "amount": fmt(collateral_amount, collateral_decimals),
+                    "amountUsd": fmt_opt(state.get("collateralUsd", 2), 2),
                 },
                 "debtToCover": {
-                    "asset": safe_get(loan, "symbol"),
-                    "amount": format_decimal(borrow_amount, loan_decimals),
-                    "amountUsd": format_optional_decimal(safe_get(state, "borrowAssetsUsd", 0), 2),
+                    "asset": loan_symbol,
+                    "amount": fmt(borrow_amount, loan_decimals),
+                    "amountUsd": fmt_opt(state.get("borrowAssetsUsd", 0), 2),
                 },
             }
         )
 
     payload = {
-        "address": safe_get(user, "address") or address,
+        "address": user.get("address") or address,
         "chainId": chain_id,
         "timestamp": now_iso(),
         "marketPositions": liquidation_positions,
@@ -219,21 +259,50 @@ async def get_liquidation(address: str, chainId: int = Query(1, alias="chainId")
 
     storage.save_snapshot_background("liquidation", payload)
 
-    return payload
-
+    return ORJSONResponse(payload)
 
-@router.get("/markets", response_model=MarketsResponse)
-async def get_markets(chainId: int = Query(1, alias="chainId")):
-    chain_id = validate_chain_id(chainId)
 
+async def _render_markets(chain_id: int) -> Tuple[bytes, str, Dict[str, Any]]:
     data = await morpho_client.fetch_markets(chain_id)
-    payload = build_markets_response(data)
+    markets = build_markets_response(data)
+    # Weak ETag: it ignores the timestamp so unchanged market data keeps validating.
+    etag = f'W/"{hashlib.blake2b(orjson.dumps(markets), digest_size=8).hexdigest()}"'
     payload = {
         "chainId": chain_id,
         "timestamp": now_iso(),
-        **payload,
+        **markets,
     }
 
+    return orjson.dumps(payload), etag, payload
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides.
+        if candidate == "*" or candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+
+@router.get(
+    "/markets",
+    responses={200: {"model": MarketsResponse}, 304: {"description": "Not Modified"}},
+)
+async def get_markets(request: Request, chainId: int = Query(1, alias="chainId")):
+    if chainId not in SUPPORTED_CHAIN_IDS:
+        raise HTTPException(status_code=400, detail="Unsupported chainId")
+    chain_id = chainId
+
+    body, etag, payload = await _markets_responses.get_or_set(
+        chain_id, MARKETS_RESPONSE_TTL, lambda: _render_markets(chain_id)
+    )
+
     storage.save_snapshot_background("markets", payload)
 
-    return payload
+    headers = {"ETag": etag, "Cache-Control": MARKETS_CACHE_CONTROL}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
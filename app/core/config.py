@@ -1,44 +1,70 @@
 from __future__ import annotations
 
-from typing import Dict, Optional
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Dict
 
-from pydantic import Field
-from pydantic_settings import BaseSettings
+from dotenv import load_dotenv
 
+load_dotenv(".env")
 
-class ChainConfig(BaseSettings):
+
+@dataclass(frozen=True)
+class ChainConfig:
     chain_id: int
     rpc_url: str
 
 
-class Settings(BaseSettings):
-    morpho_graphql_url: str = Field(
-        default="https://api.morpho.org/graphql", alias="MORPHO_GRAPHQL_URL"
+def _env(name: str, default: str) -> Callable[[], str]:
+    return lambda: os.environ.get(name, default)
+
+
+def _env_bool(name: str, default: bool) -> Callable[[], bool]:
+    def read() -> bool:
+        value = os.environ.get(name)
+        if value is None:
+            return default
+        return value.strip().lower() in ("1", "true", "t", "yes", "y", "on")
+
+    return read
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    morpho_graphql_url: str = field(
+        default_factory=_env("MORPHO_GRAPHQL_URL", "https://api.morpho.org/graphql")
     )
-    rewards_base_url: str = Field(
-        default="https://rewards.morpho.org/v1", alias="MORPHO_REWARDS_URL"
+    rewards_base_url: str = field(
+        default_factory=_env("MORPHO_REWARDS_URL", "https://rewards.morpho.org/v1")
     )
 
-    eth_rpc_url: str = Field(default="wss://ethereum-rpc.publicnode.com", alias="ETH_RPC_URL")
-    arb_rpc_url: str = Field(
-        default="https://public-arb-mainnet.fastnode.io", alias="ARB_RPC_URL"
+    eth_rpc_url: str = field(
+        default_factory=_env("ETH_RPC_URL", "wss://ethereum-rpc.publicnode.com")
     )
-    base_rpc_url: str = Field(default="https://base.drpc.org", alias="BASE_RPC_URL")
+    arb_rpc_url: str = field(
+        default_factory=_env("ARB_RPC_URL", "https://public-arb-mainnet.fastnode.io")
+    )
+    base_rpc_url: str = field(default_factory=_env("BASE_RPC_URL", "https://base.drpc.org"))
+
+    mongo_enabled: bool = field(default_factory=_env_bool("MONGO_ENABLED", True))
+    mongo_uri: str = field(default_factory=_env("MONGO_URI", "mongodb://localhost:27017"))
+    mongo_db: str = field(default_factory=_env("MONGO_DB", "morpho"))
 
-    mongo_enabled: bool = Field(default=True, alias="MONGO_ENABLED")
-    mongo_uri: str = Field(default="mongodb://localhost:27017", alias="MONGO_URI")
-    mongo_db: str = Field(default="morpho", alias="MONGO_DB")
+    _chain_configs: Dict[int, ChainConfig] = field(init=False, repr=False, compare=False)
 
-    class Config:
-        env_file = ".env"
-        extra = "ignore"
+    def __post_init__(self) -> None:
+        object.__setattr__(
+            self,
+            "_chain_configs",
+            {
+                1: ChainConfig(chain_id=1, rpc_url=self.eth_rpc_url),
+                42161: ChainConfig(chain_id=42161, rpc_url=self.arb_rpc_url),
+                8453: ChainConfig(chain_id=8453, rpc_url=self.base_rpc_url),
+            },
+        )
 
     def chain_configs(self) -> Dict[int, ChainConfig]:
-        return {
-            1: ChainConfig(chain_id=1, rpc_url=self.eth_rpc_url),
-            42161: ChainConfig(chain_id=42161, rpc_url=self.arb_rpc_url),
-            8453: ChainConfig(chain_id=8453, rpc_url=self.base_rpc_url),
-        }
+        return self._chain_configs
 
 
 settings = Settings()
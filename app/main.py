@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+import asyncio
 import warnings
+from typing import Optional
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
-from app.api.routes.morpho import morpho_client, rewards_client, router as morpho_router, storage
+from app.api.routes.morpho import onchain_client, router as morpho_router, storage
+from app.core.config import settings
+from app.services.http import close_shared_async_client, prewarm_shared_async_client
 
 try:
     from urllib3.exceptions import NotOpenSSLWarning
@@ -22,13 +27,36 @@ app = FastAPI(
     ),
     version="1.0.0",
     contact={"name": "Morpho API Maintainer"},
+    default_response_class=ORJSONResponse,
 )
 
 app.include_router(morpho_router)
 
 
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+async def _prewarm_connections() -> None:
+    graphql_health_url = settings.morpho_graphql_url.rsplit("/", 1)[0] + "/health"
+    await asyncio.gather(
+        prewarm_shared_async_client([graphql_health_url, settings.rewards_base_url]),
+        onchain_client.prewarm(),
+        return_exceptions=True,
+    )
+
+
+@app.on_event("startup")
+async def startup_event() -> None:
+    global _prewarm_task
+    storage.start()
+    # Warm connection pools in the background so startup is not delayed by slow upstreams.
+    _prewarm_task = asyncio.create_task(_prewarm_connections())
+
+
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
-    await morpho_client.close()
-    await rewards_client.close()
+    if _prewarm_task is not None and not _prewarm_task.done():
+        _prewarm_task.cancel()
+    await close_shared_async_client()
     await storage.close()
+    onchain_client.close()
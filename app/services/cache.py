@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class AsyncTTLCache:
+    """In-process TTL cache whose concurrent misses share one upstream call."""
+
+    def __init__(self, maxsize: int = 1024, sweep_interval: float = 30.0) -> None:
+        self._maxsize = maxsize
+        self._sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def _get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return True, entry[1]
+        return False, None
+
+    def _sweep(self, now: float) -> None:
+        for stale in [k for k, (expiry, _) in self._entries.items() if expiry <= now]:
+            del self._entries[stale]
+        self._next_sweep = now + self._sweep_interval
+
+    def _set(self, key: Hashable, value: Any, ttl: float) -> None:
+        now = time.monotonic()
+        # Expired entries are dropped periodically, not only when the cache fills up.
+        if now >= self._next_sweep or len(self._entries) >= self._maxsize:
+            self._sweep(now)
+            if len(self._entries) >= self._maxsize:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + ttl, value)
+
+    async def _load(
+        self, key: Hashable, ttl: float, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        try:
+            value = await factory()
+            self._set(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_set(
+        self, key: Hashable, ttl: float, factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        hit, value = self._get(key)
+        if hit:
+            return value
+        future = self._inflight.get(key)
+        if future is None:
+            # Every concurrent caller awaits the same load, so a failure is raised to all of
+            # them at once instead of each waiter retrying the upstream in turn.
+            future = asyncio.ensure_future(self._load(key, ttl, factory))
+            future.add_done_callback(_consume_exception)
+            self._inflight[key] = future
+        # Shielded so that one cancelled caller does not cancel the load for the others.
+        return await asyncio.shield(future)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Mark the exception as retrieved when every waiter was cancelled before it arrived.
+    if not future.cancelled():
+        future.exception()
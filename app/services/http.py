@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+from functools import lru_cache
+from typing import Iterable
+
+import httpx
+
+
+@lru_cache(maxsize=None)
+def shared_async_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=200, max_keepalive_connections=50, keepalive_expiry=60
+        ),
+        timeout=20,
+    )
+
+
+async def close_shared_async_client() -> None:
+    if shared_async_client.cache_info().currsize:
+        await shared_async_client().aclose()
+        shared_async_client.cache_clear()
+
+
+async def prewarm_shared_async_client(urls: Iterable[str], timeout: float = 5) -> None:
+    """Open keep-alive connections so the first request skips the TCP/TLS handshake."""
+    client = shared_async_client()
+    await asyncio.gather(
+        *[client.get(url, timeout=timeout) for url in urls], return_exceptions=True
+    )
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import hashlib
 import math
 from decimal import Decimal, InvalidOperation
-from typing import Any, Dict, Iterable, List, Optional
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import httpx
+import orjson
 
 from app.core.config import settings
+from app.services.cache import AsyncTTLCache
+from app.services.http import shared_async_client
 
 USER_BY_ADDRESS_QUERY = """
 query UserByAddress($chainId: Int!, $address: String!) {
@@ -152,9 +158,7 @@ query UserByAddress($chainId: Int!, $address: String!) {
 }
 """
 
-VAULT_BY_ADDRESS_QUERY = """
-query VaultByAddress($chainId: Int!, $address: String!) {
-  vaultByAddress(chainId: $chainId, address: $address) {
+VAULT_ALLOCATION_FIELDS = """
     address
     state {
       totalAssetsUsd
@@ -184,8 +188,12 @@ query VaultByAddress($chainId: Int!, $address: String!) {
         supplyCapUsd
       }
     }
-  }
-}
+"""
+
+VAULT_BY_ADDRESS_QUERY = f"""
+query VaultByAddress($chainId: Int!, $address: String!) {{
+  vaultByAddress(chainId: $chainId, address: $address) {{{VAULT_ALLOCATION_FIELDS}  }}
+}}
 """
 
 MARKETS_QUERY = """
@@ -264,6 +272,47 @@ query MarketsAndVaults($chainIds: [Int!]) {
 """
 
 
+def _persisted_query(query: str, operation_name: str) -> Tuple[str, str]:
+    return operation_name, hashlib.sha256(query.encode()).hexdigest()
+
+
+# Automatic persisted queries: once the server has seen a query, later requests
+# only carry its SHA-256 hash instead of the full document.
+PERSISTED_QUERIES: Dict[str, Tuple[str, str]] = {
+    USER_BY_ADDRESS_QUERY: _persisted_query(USER_BY_ADDRESS_QUERY, "UserByAddress"),
+    VAULT_BY_ADDRESS_QUERY: _persisted_query(VAULT_BY_ADDRESS_QUERY, "VaultByAddress"),
+    MARKETS_QUERY: _persisted_query(MARKETS_QUERY, "MarketsAndVaults"),
+}
+
+USER_QUERY_CACHE_TTL = 10.0
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def _has_error_code(payload: Any, code: str) -> bool:
+    if not isinstance(payload, dict):
+        return False
+    for error in payload.get("errors") or []:
+        if isinstance(error, dict) and (error.get("extensions") or _EMPTY).get("code") == code:
+            return True
+    return False
+
+
+def _has_data(resp: httpx.Response, payload: Any) -> bool:
+    # GraphQL execution errors still come back with a "data" key; the query itself ran.
+    return resp.is_success and isinstance(payload, dict) and "data" in payload
+
+
+def _is_missing_query(resp: httpx.Response, payload: Any) -> bool:
+    # A server that ignores APQ rejects a hash-only body as a request without a query.
+    return (
+        resp.status_code < 500
+        and isinstance(payload, dict)
+        and bool(payload.get("errors"))
+        and "data" not in payload
+    )
+
+
 def safe_get(data: Any, key: str, default: Any = None) -> Any:
     if not isinstance(data, dict):
         return default
@@ -281,32 +330,58 @@ def to_decimal(value: Any, default: str = "0") -> Decimal:
         return Decimal(default)
 
 
+_QUANTIZE_EXPONENTS = {n: Decimal(1).scaleb(-n) for n in range(0, 25)}
+
+
 def format_decimal(value: Decimal, decimals: int = 2) -> str:
     if not value.is_finite():
         return "0"
-    quantize_exp = Decimal("1") if decimals == 0 else Decimal(f"1e-{decimals}")
+    quantize_exp = _QUANTIZE_EXPONENTS.get(decimals)
+    if quantize_exp is None:
+        quantize_exp = Decimal(1).scaleb(-decimals)
     try:
         return str(value.quantize(quantize_exp))
     except InvalidOperation:
         return str(value)
 
 
+def to_float(value: Any, default: float = 0.0) -> float:
+    if value is None:
+        return default
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return default
+    return result if math.isfinite(result) else default
+
+
 def to_percent(value: Any, decimals: int = 2) -> str:
-    dec = to_decimal(value) * Decimal("100")
-    return format_decimal(dec, decimals)
+    return f"{to_float(value) * 100:.{decimals}f}"
 
 
 def normalize_lltv(value: Any, decimals: int = 2) -> str:
-    dec = to_decimal(value)
-    if dec > 1:
-        dec = dec / Decimal("1e18")
-    return format_decimal(dec, decimals)
+    return _normalize_lltv(str(value), decimals)
+
+
+@lru_cache(maxsize=4096)
+def _normalize_lltv(raw: str, decimals: int) -> str:
+    # Markets share a small set of LLTV values, so the parsed result is memoized.
+    lltv = to_float(raw)
+    if lltv > 1:
+        lltv = lltv / 1e18
+    return f"{lltv:.{decimals}f}"
 
 
 def format_optional_decimal(value: Any, decimals: int = 2) -> str:
+    """Exact formatting for raw on-chain amounts, which can exceed float precision."""
     return format_decimal(to_decimal(value), decimals)
 
 
+def format_optional_float(value: Any, decimals: int = 2) -> str:
+    """Display formatting for USD values, rates and fees."""
+    return f"{to_float(value):.{decimals}f}"
+
+
 def format_optional_raw(value: Any) -> str:
     if value is None:
         return "0"
@@ -314,315 +389,384 @@ def format_optional_raw(value: Any) -> str:
 
 
 def compute_weighted_reward_apy(
-    allocation_markets: Iterable[Dict[str, Any]], total_assets_usd: Decimal
-) -> Decimal:
+    allocation_markets: Iterable[Dict[str, Any]], total_assets_usd: float
+) -> float:
     if total_assets_usd <= 0:
-        return Decimal("0")
-    total = Decimal("0")
+        return 0.0
+    weighted_sum = 0.0
     for allocation in allocation_markets:
-        market = safe_get(allocation, "market", {})
-        market_state = safe_get(market, "state", {})
-        supply_assets_usd = to_decimal(safe_get(allocation, "supplyAssetsUsd", 0))
+        if not allocation:
+            continue
+        supply_assets_usd = to_float(allocation.get("supplyAssetsUsd"))
         if supply_assets_usd <= 0:
             continue
-        rewards = safe_get(market_state, "rewards", []) or []
-        reward_apr_sum = Decimal("0")
-        for reward in rewards:
-            reward_apr_sum += to_decimal(safe_get(reward, "supplyApr", 0))
-        weight = supply_assets_usd / total_assets_usd
-        total += reward_apr_sum * weight
-    return total
+        market_state = (allocation.get("market") or _EMPTY).get("state") or _EMPTY
+        rewards = market_state.get("rewards") or []
+        weighted_sum += sum(to_float(r.get("supplyApr")) for r in rewards if r) * supply_assets_usd
+    return weighted_sum / total_assets_usd
 
 
 class MorphoClient:
-    def __init__(self) -> None:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None) -> None:
         self._url = settings.morpho_graphql_url
-        self._client = httpx.AsyncClient(timeout=20)
-
-    async def close(self) -> None:
-        await self._client.aclose()
-
-    async def _query(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
-        resp = await self._client.post(self._url, json={"query": query, "variables": variables})
+        self._client = client or shared_async_client()
+        self._cache = AsyncTTLCache()
+        self._known_hashes: Set[str] = set()
+        self._persisted_queries_supported = True
+
+    def invalidate(self) -> None:
+        self._cache.invalidate()
+
+    async def _send(self, body: Dict[str, Any]) -> Tuple[httpx.Response, Any]:
+        resp = await self._client.post(self._url, json=body)
+        try:
+            payload = orjson.loads(resp.content)
+        except orjson.JSONDecodeError:
+            payload = None
+        return resp, payload
+
+    async def _post(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        persisted = PERSISTED_QUERIES.get(query) if self._persisted_queries_supported else None
+        if persisted is None:
+            resp, payload = await self._send({"query": query, "variables": variables})
+            resp.raise_for_status()
+            return payload
+
+        operation_name, sha256_hash = persisted
+        body: Dict[str, Any] = {
+            "operationName": operation_name,
+            "variables": variables,
+            "extensions": {"persistedQuery": {"version": 1, "sha256Hash": sha256_hash}},
+        }
+        if sha256_hash in self._known_hashes:
+            resp, payload = await self._send(body)
+            if _has_error_code(payload, "PERSISTED_QUERY_NOT_SUPPORTED"):
+                self._persisted_queries_supported = False
+                return await self._post(query, variables)
+            if not _has_error_code(payload, "PERSISTED_QUERY_NOT_FOUND"):
+                if _is_missing_query(resp, payload):
+                    resp, payload = await self._send(
+                        {"operationName": operation_name, "query": query, "variables": variables}
+                    )
+                    if _has_data(resp, payload):
+                        self._persisted_queries_supported = False
+                resp.raise_for_status()
+                return payload
+            self._known_hashes.discard(sha256_hash)
+
+        # Unknown (or evicted) hash: send the full document so the server registers it.
+        resp, payload = await self._send({**body, "query": query})
+        if _has_error_code(payload, "PERSISTED_QUERY_NOT_SUPPORTED"):
+            self._persisted_queries_supported = False
+            return await self._post(query, variables)
         resp.raise_for_status()
-        data = resp.json()
+        self._known_hashes.add(sha256_hash)
+        return payload
+
+    async def _fetch(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        data = await self._post(query, variables)
         if "errors" in data:
             raise ValueError(f"GraphQL error: {data['errors']}")
         return data.get("data", {})
 
+    async def _query(
+        self, query: str, variables: Dict[str, Any], ttl: float = USER_QUERY_CACHE_TTL
+    ) -> Dict[str, Any]:
+        key = (query, orjson.dumps(variables, option=orjson.OPT_SORT_KEYS))
+        return await self._cache.get_or_set(key, ttl, lambda: self._fetch(query, variables))
+
     async def fetch_user_by_address(self, chain_id: int, address: str) -> Dict[str, Any]:
         return await self._query(USER_BY_ADDRESS_QUERY, {"chainId": chain_id, "address": address})
 
     async def fetch_vault_by_address(self, chain_id: int, address: str) -> Dict[str, Any]:
         return await self._query(VAULT_BY_ADDRESS_QUERY, {"chainId": chain_id, "address": address})
 
+    async def fetch_vaults_by_addresses(
+        self, chain_id: int, addresses: Iterable[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Fetch allocation data for several vaults in one aliased GraphQL query.
+
+        Vaults the API cannot resolve are omitted; partial results are kept even
+        when the response also carries errors for some aliases. Results are cached
+        per chain and address set.
+        """
+        unique = tuple(sorted(set(addr for addr in addresses if addr)))
+        if not unique:
+            return {}
+        key = ("VaultsByAddresses", chain_id, unique)
+        return await self._cache.get_or_set(
+            key, USER_QUERY_CACHE_TTL, lambda: self._fetch_vaults(chain_id, unique)
+        )
+
+    async def _fetch_vaults(
+        self, chain_id: int, addresses: Tuple[str, ...]
+    ) -> Dict[str, Dict[str, Any]]:
+        params = ", ".join(f"$a{i}: String!" for i in range(len(addresses)))
+        fields = "".join(
+            f"  v{i}: vaultByAddress(chainId: $chainId, address: $a{i}) {{{VAULT_ALLOCATION_FIELDS}  }}\n"
+            for i in range(len(addresses))
+        )
+        query = f"query VaultsByAddresses($chainId: Int!, {params}) {{\n{fields}}}"
+        variables: Dict[str, Any] = {"chainId": chain_id}
+        variables.update({f"a{i}": addr for i, addr in enumerate(addresses)})
+
+        data = safe_get(await self._post(query, variables), "data") or {}
+        results: Dict[str, Dict[str, Any]] = {}
+        for i, addr in enumerate(addresses):
+            vault = safe_get(data, f"v{i}")
+            if vault:
+                results[addr] = vault
+        return results
+
     async def fetch_markets(self, chain_id: int) -> Dict[str, Any]:
-        return await self._query(MARKETS_QUERY, {"chainIds": [chain_id]})
+        # Not cached here: the /markets route caches the rendered response, and a second
+        # TTL layer underneath would let it rebuild from stale upstream data.
+        return await self._fetch(MARKETS_QUERY, {"chainIds": [chain_id]})
+
+
+def _build_allocation_row(item: Dict[str, Any], total_assets_usd: float) -> Dict[str, Any]:
+    market = item.get("market") or _EMPTY
+    loan = market.get("loanAsset") or _EMPTY
+    collateral = market.get("collateralAsset") or _EMPTY
+    market_state = market.get("state") or _EMPTY
+    supply_assets_usd = to_float(item.get("supplyAssetsUsd", 0))
+    allocation_percent = (
+        supply_assets_usd / total_assets_usd * 100 if total_assets_usd > 0 else 0.0
+    )
+    return {
+        "marketId": market.get("uniqueKey"),
+        "marketName": f"{collateral.get('symbol', 'N/A')}/{loan.get('symbol', 'N/A')}",
+        "allocationPercent": f"{allocation_percent:.2f}",
+        "supplyApy": to_percent(market_state.get("avgNetSupplyApy", 0), 2),
+    }
 
 
 async def build_vault_position_from_v1(position: Dict[str, Any]) -> Dict[str, Any]:
-    state = safe_get(position, "state", {})
-    vault = safe_get(position, "vault", {})
-    vault_state = safe_get(vault, "state", {})
-    asset = safe_get(vault, "asset", {})
-
-    total_assets_usd = to_decimal(safe_get(vault_state, "totalAssetsUsd", 0))
-    allocation = safe_get(vault_state, "allocation", []) or []
-
-    reward_apy_dec = compute_weighted_reward_apy(allocation, total_assets_usd)
-    net_apy_dec = to_decimal(safe_get(vault_state, "avgNetApy", 0))
-    base_apy_dec = max(net_apy_dec - reward_apy_dec, Decimal("0"))
-
-    allocations = []
-    for item in allocation:
-        market = safe_get(item, "market", {})
-        loan = safe_get(market, "loanAsset", {})
-        collateral = safe_get(market, "collateralAsset", {})
-        market_state = safe_get(market, "state", {})
-        supply_assets_usd = to_decimal(safe_get(item, "supplyAssetsUsd", 0))
-        allocation_percent = (
-            supply_assets_usd / total_assets_usd * Decimal("100")
-            if total_assets_usd > 0
-            else Decimal("0")
-        )
-        market_name = f"{safe_get(collateral, 'symbol', 'N/A')}/{safe_get(loan, 'symbol', 'N/A')}"
-        allocations.append(
-            {
-                "marketId": safe_get(market, "uniqueKey"),
-                "marketName": market_name,
-                "allocationPercent": format_decimal(allocation_percent, 2),
-                "supplyApy": to_percent(safe_get(market_state, "avgNetSupplyApy", 0), 2),
-            }
-        )
-    allocations.sort(key=lambda x: to_decimal(x.get("allocationPercent", 0)), reverse=True)
+    state = position.get("state") or _EMPTY
+    vault = position.get("vault") or _EMPTY
+    vault_state = vault.get("state") or _EMPTY
+    asset = vault.get("asset") or _EMPTY
+
+    total_assets_usd = to_float(vault_state.get("totalAssetsUsd", 0))
+    allocation = vault_state.get("allocation") or []
+
+    reward_apy = compute_weighted_reward_apy(allocation, total_assets_usd)
+    net_apy = to_float(vault_state.get("avgNetApy", 0))
+    base_apy = max(net_apy - reward_apy, 0.0)
+
+    allocations = [_build_allocation_row(item or _EMPTY, total_assets_usd) for item in allocation]
+    allocations.sort(key=lambda x: float(x["allocationPercent"]), reverse=True)
 
-    curator_name = None
-    curators = safe_get(vault_state, "curators", []) or []
-    if curators:
-        curator_name = safe_get(curators[0], "name")
+    curators = vault_state.get("curators") or []
+    curator_name = (curators[0] or _EMPTY).get("name") if curators else None
 
     return {
-        "vaultAddress": safe_get(vault, "address"),
-        "vaultName": safe_get(vault, "name"),
+        "vaultAddress": vault.get("address"),
+        "vaultName": vault.get("name"),
         "curator": curator_name,
-        "asset": safe_get(asset, "symbol"),
-        "assetAddress": safe_get(asset, "address"),
-        "shares": format_optional_raw(safe_get(state, "shares")),
-        "balance": format_optional_decimal(safe_get(state, "assets"), 2),
-        "balanceUsd": format_optional_decimal(safe_get(state, "assetsUsd"), 2),
+        "asset": asset.get("symbol"),
+        "assetAddress": asset.get("address"),
+        "shares": format_optional_raw(state.get("shares")),
+        "balance": format_optional_decimal(state.get("assets"), 2),
+        "balanceUsd": format_optional_float(state.get("assetsUsd"), 2),
         "apy": {
-            "netApy": to_percent(net_apy_dec, 2),
-            "baseApy": to_percent(base_apy_dec, 2),
-            "rewardApy": to_percent(reward_apy_dec, 2),
+            "netApy": to_percent(net_apy, 2),
+            "baseApy": to_percent(base_apy, 2),
+            "rewardApy": to_percent(reward_apy, 2),
         },
-        "performanceFee": format_optional_decimal(safe_get(vault_state, "fee"), 2),
-        "totalAssets": format_optional_decimal(total_assets_usd, 2),
+        "performanceFee": format_optional_float(vault_state.get("fee"), 2),
+        "totalAssets": f"{total_assets_usd:.2f}",
         "allocations": allocations,
     }
 
 
 async def build_vault_position_from_v2(position: Dict[str, Any], allocation_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-    vault = safe_get(position, "vault", {})
-    asset = safe_get(vault, "asset", {})
+    vault = position.get("vault") or _EMPTY
+    asset = vault.get("asset") or _EMPTY
 
-    total_assets_usd = to_decimal(safe_get(vault, "totalAssetsUsd", 0))
-    rewards = safe_get(vault, "rewards", []) or []
-    reward_apy_dec = sum((to_decimal(safe_get(r, "supplyApr", 0)) for r in rewards), Decimal("0"))
-    net_apy_dec = to_decimal(safe_get(vault, "avgNetApy", 0))
-    base_apy_dec = max(net_apy_dec - reward_apy_dec, Decimal("0"))
+    total_assets_usd = to_float(vault.get("totalAssetsUsd", 0))
+    rewards = vault.get("rewards") or []
+    reward_apy = sum(to_float(r.get("supplyApr", 0)) for r in rewards if r)
+    net_apy = to_float(vault.get("avgNetApy", 0))
+    base_apy = max(net_apy - reward_apy, 0.0)
 
-    allocations = []
+    allocations: List[Dict[str, Any]] = []
     if allocation_data:
-        allocation_state = safe_get(allocation_data, "state", {})
-        allocation = safe_get(allocation_state, "allocation", []) or []
-        total_assets_usd = to_decimal(safe_get(allocation_state, "totalAssetsUsd", total_assets_usd))
-        for item in allocation:
-            market = safe_get(item, "market", {})
-            loan = safe_get(market, "loanAsset", {})
-            collateral = safe_get(market, "collateralAsset", {})
-            market_state = safe_get(market, "state", {})
-            supply_assets_usd = to_decimal(safe_get(item, "supplyAssetsUsd", 0))
-            allocation_percent = (
-                supply_assets_usd / total_assets_usd * Decimal("100")
-                if total_assets_usd > 0
-                else Decimal("0")
-            )
-            market_name = f"{safe_get(collateral, 'symbol', 'N/A')}/{safe_get(loan, 'symbol', 'N/A')}"
-            allocations.append(
-                {
-                    "marketId": safe_get(market, "uniqueKey"),
-                    "marketName": market_name,
-                    "allocationPercent": format_decimal(allocation_percent, 2),
-                    "supplyApy": to_percent(safe_get(market_state, "avgNetSupplyApy", 0), 2),
-                }
-            )
-        allocations.sort(key=lambda x: to_decimal(x.get("allocationPercent", 0)), reverse=True)
+        allocation_state = allocation_data.get("state") or _EMPTY
+        allocation = allocation_state.get("allocation") or []
+        total_assets_usd = to_float(allocation_state.get("totalAssetsUsd", total_assets_usd))
+        allocations = [
+            _build_allocation_row(item or _EMPTY, total_assets_usd) for item in allocation
+        ]
+        allocations.sort(key=lambda x: float(x["allocationPercent"]), reverse=True)
 
-    curator_name = None
-    curators = safe_get(vault, "curators", {})
-    if isinstance(curators, dict):
-        cur_items = safe_get(curators, "items", []) or []
-        if cur_items:
-            curator_name = safe_get(cur_items[0], "name")
+    cur_items = (vault.get("curators") or _EMPTY).get("items") or []
+    curator_name = (cur_items[0] or _EMPTY).get("name") if cur_items else None
 
     return {
-        "vaultAddress": safe_get(vault, "address"),
-        "vaultName": safe_get(vault, "name"),
+        "vaultAddress": vault.get("address"),
+        "vaultName": vault.get("name"),
         "curator": curator_name,
-        "asset": safe_get(asset, "symbol"),
-        "assetAddress": safe_get(asset, "address"),
-        "shares": format_optional_raw(safe_get(position, "shares")),
-        "balance": format_optional_decimal(safe_get(position, "assets"), 2),
-        "balanceUsd": format_optional_decimal(safe_get(position, "assetsUsd"), 2),
+        "asset": asset.get("symbol"),
+        "assetAddress": asset.get("address"),
+        "shares": format_optional_raw(position.get("shares")),
+        "balance": format_optional_decimal(position.get("assets"), 2),
+        "balanceUsd": format_optional_float(position.get("assetsUsd"), 2),
         "apy": {
-            "netApy": to_percent(net_apy_dec, 2),
-            "baseApy": to_percent(base_apy_dec, 2),
-            "rewardApy": to_percent(reward_apy_dec, 2),
+            "netApy": to_percent(net_apy, 2),
+            "baseApy": to_percent(base_apy, 2),
+            "rewardApy": to_percent(reward_apy, 2),
         },
-        "performanceFee": format_optional_decimal(safe_get(vault, "performanceFee"), 2),
-        "totalAssets": format_optional_decimal(total_assets_usd, 2),
+        "performanceFee": format_optional_float(vault.get("performanceFee"), 2),
+        "totalAssets": f"{total_assets_usd:.2f}",
         "allocations": allocations,
     }
 
 
+def _build_market_position_row(position: Dict[str, Any]) -> Dict[str, Any]:
+    state = position.get("state") or _EMPTY
+    market = position.get("market") or _EMPTY
+    loan = market.get("loanAsset") or _EMPTY
+    collateral = market.get("collateralAsset") or _EMPTY
+    market_state = market.get("state") or _EMPTY
+
+    return {
+        "marketId": market.get("uniqueKey"),
+        "loanAsset": loan.get("symbol"),
+        "loanAssetAddress": loan.get("address"),
+        "collateralAsset": collateral.get("symbol"),
+        "collateralAssetAddress": collateral.get("address"),
+        "oracle": (market.get("oracle") or _EMPTY).get("address"),
+        "irm": market.get("irmAddress"),
+        "lltv": normalize_lltv(market.get("lltv"), 2),
+        "supply": {
+            "shares": format_optional_raw(state.get("supplyShares")),
+            "assets": format_optional_decimal(state.get("supplyAssets"), 2),
+            "assetsUsd": format_optional_float(state.get("supplyAssetsUsd"), 2),
+        },
+        "borrow": {
+            "shares": format_optional_raw(state.get("borrowShares")),
+            "assets": format_optional_decimal(state.get("borrowAssets"), 2),
+            "assetsUsd": format_optional_float(state.get("borrowAssetsUsd"), 2),
+        },
+        "collateral": {
+            "assets": format_optional_decimal(state.get("collateral"), 2),
+            "assetsUsd": format_optional_float(state.get("collateralUsd"), 2),
+        },
+        "healthFactor": format_optional_float(position.get("healthFactor"), 2),
+        "apy": {
+            "borrowApy": to_percent(market_state.get("borrowApy", 0), 2),
+            "avgBorrowApy": to_percent(market_state.get("avgBorrowApy", 0), 2),
+            "netBorrowApy": to_percent(market_state.get("avgNetBorrowApy", 0), 2),
+        },
+    }
+
+
 def build_market_positions(market_positions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    items: List[Dict[str, Any]] = []
-    for position in market_positions:
-        state = safe_get(position, "state", {})
-        market = safe_get(position, "market", {})
-        loan = safe_get(market, "loanAsset", {})
-        collateral = safe_get(market, "collateralAsset", {})
-        market_state = safe_get(market, "state", {})
-
-        items.append(
-            {
-                "marketId": safe_get(market, "uniqueKey"),
-                "loanAsset": safe_get(loan, "symbol"),
-                "loanAssetAddress": safe_get(loan, "address"),
-                "collateralAsset": safe_get(collateral, "symbol"),
-                "collateralAssetAddress": safe_get(collateral, "address"),
-                "oracle": safe_get(safe_get(market, "oracle", {}), "address"),
-                "irm": safe_get(market, "irmAddress"),
-                "lltv": normalize_lltv(safe_get(market, "lltv"), 2),
-                "supply": {
-                    "shares": format_optional_raw(safe_get(state, "supplyShares")),
-                    "assets": format_optional_decimal(safe_get(state, "supplyAssets"), 2),
-                    "assetsUsd": format_optional_decimal(safe_get(state, "supplyAssetsUsd"), 2),
-                },
-                "borrow": {
-                    "shares": format_optional_raw(safe_get(state, "borrowShares")),
-                    "assets": format_optional_decimal(safe_get(state, "borrowAssets"), 2),
-                    "assetsUsd": format_optional_decimal(safe_get(state, "borrowAssetsUsd"), 2),
-                },
-                "collateral": {
-                    "assets": format_optional_decimal(safe_get(state, "collateral"), 2),
-                    "assetsUsd": format_optional_decimal(safe_get(state, "collateralUsd"), 2),
-                },
-                "healthFactor": format_optional_decimal(safe_get(position, "healthFactor"), 2),
-                "apy": {
-                    "borrowApy": to_percent(safe_get(market_state, "borrowApy", 0), 2),
-                    "avgBorrowApy": to_percent(safe_get(market_state, "avgBorrowApy", 0), 2),
-                    "netBorrowApy": to_percent(safe_get(market_state, "avgNetBorrowApy", 0), 2),
-                },
-                "_extra": {
-                    "priceVariationToLiquidationPrice": safe_get(
-                        position, "priceVariationToLiquidationPrice"
-                    ),
-                    "loanPriceUsd": safe_get(loan, "priceUsd"),
-                    "collateralPriceUsd": safe_get(collateral, "priceUsd"),
-                },
-            }
-        )
-    return items
+    return [_build_market_position_row(position or _EMPTY) for position in market_positions]
+
+
+def _build_vault_row(
+    *,
+    address: Optional[str],
+    name: Optional[str],
+    curator: Optional[str],
+    asset: Dict[str, Any],
+    total_assets: Any,
+    total_assets_usd: float,
+    avg_apy: Any,
+    avg_net_apy: Any,
+    rewards: List[Dict[str, Any]],
+    fee: Any,
+) -> Dict[str, Any]:
+    reward_apy = sum(to_float(r.get("supplyApr")) for r in rewards if r)
+    return {
+        "vaultAddress": address,
+        "vaultName": name,
+        "curator": curator,
+        "asset": asset.get("symbol"),
+        "assetAddress": asset.get("address"),
+        "totalAssets": format_optional_decimal(total_assets, 2),
+        "totalAssetsUsd": f"{total_assets_usd:.2f}",
+        "apy": {
+            "netApy": to_percent(to_float(avg_net_apy), 2),
+            "baseApy": to_percent(max(to_float(avg_apy), 0.0), 2),
+            "rewardApy": to_percent(reward_apy, 2),
+        },
+        "performanceFee": format_optional_float(fee, 2),
+    }
+
+
+def _build_vault_v1_row(vault: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
+    state = vault.get("state") or _EMPTY
+    curators = state.get("curators") or []
+    total_assets_usd = to_float(state.get("totalAssetsUsd"))
+    row = _build_vault_row(
+        address=vault.get("address"),
+        name=vault.get("name"),
+        curator=(curators[0] or _EMPTY).get("name") if curators else None,
+        asset=vault.get("asset") or _EMPTY,
+        total_assets=state.get("totalAssets"),
+        total_assets_usd=total_assets_usd,
+        avg_apy=state.get("avgApy"),
+        avg_net_apy=state.get("avgNetApy"),
+        rewards=state.get("rewards") or [],
+        fee=state.get("fee"),
+    )
+    return total_assets_usd, row
+
+
+def _build_vault_v2_row(vault: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
+    cur_items = (vault.get("curators") or _EMPTY).get("items") or []
+    total_assets_usd = to_float(vault.get("totalAssetsUsd"))
+    row = _build_vault_row(
+        address=vault.get("address"),
+        name=vault.get("name"),
+        curator=(cur_items[0] or _EMPTY).get("name") if cur_items else None,
+        asset=vault.get("asset") or _EMPTY,
+        total_assets=vault.get("totalAssets"),
+        total_assets_usd=total_assets_usd,
+        avg_apy=vault.get("avgApy"),
+        avg_net_apy=vault.get("avgNetApy"),
+        rewards=vault.get("rewards") or [],
+        fee=vault.get("performanceFee"),
+    )
+    return total_assets_usd, row
+
+
+def _build_market_row(market: Dict[str, Any]) -> Dict[str, Any]:
+    loan = market.get("loanAsset") or _EMPTY
+    collateral = market.get("collateralAsset") or _EMPTY
+    state = market.get("state") or _EMPTY
+    return {
+        "marketId": market.get("uniqueKey"),
+        "loanAsset": loan.get("symbol"),
+        "loanAssetAddress": loan.get("address"),
+        "collateralAsset": collateral.get("symbol"),
+        "collateralAssetAddress": collateral.get("address"),
+        "lltv": normalize_lltv(market.get("lltv"), 2),
+        "totalSupply": format_optional_decimal(state.get("supplyAssets"), 2),
+        "totalSupplyUsd": format_optional_float(state.get("supplyAssetsUsd"), 2),
+        "totalBorrow": format_optional_decimal(state.get("borrowAssets"), 2),
+        "totalBorrowUsd": format_optional_float(state.get("borrowAssetsUsd"), 2),
+        "utilizationRate": format_optional_float(state.get("utilization"), 2),
+        "supplyApy": to_percent(state.get("avgNetSupplyApy", 0), 2),
+        "borrowApy": to_percent(state.get("avgNetBorrowApy", 0), 2),
+    }
 
 
 def build_markets_response(data: Dict[str, Any]) -> Dict[str, Any]:
-    vaults = safe_get(data, "vaults", {}).get("items", []) or []
-    vault_v2s = safe_get(data, "vaultV2s", {}).get("items", []) or []
-    markets = safe_get(data, "markets", {}).get("items", []) or []
-
-    vault_items: List[Dict[str, Any]] = []
-
-    for vault in vaults:
-        asset = safe_get(vault, "asset", {})
-        state = safe_get(vault, "state", {})
-        curators = safe_get(state, "curators", []) or []
-        curator_name = safe_get(curators[0], "name") if curators else None
-        rewards = safe_get(state, "rewards", []) or []
-        reward_apy_dec = sum((to_decimal(safe_get(r, "supplyApr", 0)) for r in rewards), Decimal("0"))
-        net_apy_dec = to_decimal(safe_get(state, "avgNetApy", 0))
-        base_apy_dec = max(to_decimal(safe_get(state, "avgApy", 0)) , Decimal("0"))
-
-        vault_items.append(
-            {
-                "vaultAddress": safe_get(vault, "address"),
-                "vaultName": safe_get(vault, "name"),
-                "curator": curator_name,
-                "asset": safe_get(asset, "symbol"),
-                "assetAddress": safe_get(asset, "address"),
-                "totalAssets": format_optional_decimal(safe_get(state, "totalAssets"), 2),
-                "totalAssetsUsd": format_optional_decimal(safe_get(state, "totalAssetsUsd"), 2),
-                "apy": {
-                    "netApy": to_percent(net_apy_dec, 2),
-                    "baseApy": to_percent(base_apy_dec, 2),
-                    "rewardApy": to_percent(reward_apy_dec, 2),
-                },
-                "performanceFee": format_optional_decimal(safe_get(state, "fee"), 2),
-            }
-        )
+    vaults = (safe_get(data, "vaults") or _EMPTY).get("items") or []
+    vault_v2s = (safe_get(data, "vaultV2s") or _EMPTY).get("items") or []
+    markets = (safe_get(data, "markets") or _EMPTY).get("items") or []
 
-    for vault in vault_v2s:
-        asset = safe_get(vault, "asset", {})
-        curators = safe_get(vault, "curators", {})
-        cur_items = safe_get(curators, "items", []) or []
-        curator_name = safe_get(cur_items[0], "name") if cur_items else None
-        rewards = safe_get(vault, "rewards", []) or []
-        reward_apy_dec = sum((to_decimal(safe_get(r, "supplyApr", 0)) for r in rewards), Decimal("0"))
-        net_apy_dec = to_decimal(safe_get(vault, "avgNetApy", 0))
-        base_apy_dec = max(to_decimal(safe_get(vault, "avgApy", 0)), Decimal("0"))
-
-        vault_items.append(
-            {
-                "vaultAddress": safe_get(vault, "address"),
-                "vaultName": safe_get(vault, "name"),
-                "curator": curator_name,
-                "asset": safe_get(asset, "symbol"),
-                "assetAddress": safe_get(asset, "address"),
-                "totalAssets": format_optional_decimal(safe_get(vault, "totalAssets"), 2),
-                "totalAssetsUsd": format_optional_decimal(safe_get(vault, "totalAssetsUsd"), 2),
-                "apy": {
-                    "netApy": to_percent(net_apy_dec, 2),
-                    "baseApy": to_percent(base_apy_dec, 2),
-                    "rewardApy": to_percent(reward_apy_dec, 2),
-                },
-                "performanceFee": format_optional_decimal(safe_get(vault, "performanceFee"), 2),
-            }
-        )
+    # Rows are paired with their numeric TVL so sorting does not re-parse formatted strings.
+    vault_rows = [_build_vault_v1_row(vault or _EMPTY) for vault in vaults]
+    vault_rows.extend(_build_vault_v2_row(vault or _EMPTY) for vault in vault_v2s)
+    vault_rows.sort(key=itemgetter(0), reverse=True)
+    vault_items = [row for _, row in vault_rows]
 
-    vault_items.sort(key=lambda x: to_decimal(x.get("totalAssetsUsd", 0)), reverse=True)
-
-    market_items: List[Dict[str, Any]] = []
-    for market in markets:
-        loan = safe_get(market, "loanAsset", {})
-        collateral = safe_get(market, "collateralAsset", {})
-        state = safe_get(market, "state", {})
-        market_items.append(
-            {
-                "marketId": safe_get(market, "uniqueKey"),
-                "loanAsset": safe_get(loan, "symbol"),
-                "loanAssetAddress": safe_get(loan, "address"),
-                "collateralAsset": safe_get(collateral, "symbol"),
-                "collateralAssetAddress": safe_get(collateral, "address"),
-                "lltv": normalize_lltv(safe_get(market, "lltv"), 2),
-                "totalSupply": format_optional_decimal(safe_get(state, "supplyAssets"), 2),
-                "totalSupplyUsd": format_optional_decimal(safe_get(state, "supplyAssetsUsd"), 2),
-                "totalBorrow": format_optional_decimal(safe_get(state, "borrowAssets"), 2),
-                "totalBorrowUsd": format_optional_decimal(safe_get(state, "borrowAssetsUsd"), 2),
-                "utilizationRate": format_optional_decimal(safe_get(state, "utilization"), 2),
-                "supplyApy": to_percent(safe_get(state, "avgNetSupplyApy", 0), 2),
-                "borrowApy": to_percent(safe_get(state, "avgNetBorrowApy", 0), 2),
-            }
-        )
+    market_items = [_build_market_row(market or _EMPTY) for market in markets]
 
     return {
         "vaults": vault_items,
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
+import requests
+from requests.adapters import HTTPAdapter
 from web3 import HTTPProvider, Web3, WebsocketProvider
+from web3.contract import Contract
 
 from app.core.config import settings
 
@@ -17,10 +22,90 @@ METAMORPHO_ADAPTER_ABI = [
     }
 ]
 
+# Multicall3 is deployed at the same address on every supported chain.
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"},
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    }
+]
+
+RPC_POOL_SIZE = 50
+RPC_MAX_WORKERS = 16
+
+
+@lru_cache(maxsize=4096)
+def _checksum_address(address: str) -> Optional[str]:
+    if not Web3.is_address(address):
+        return None
+    return Web3.to_checksum_address(address)
+
+
+@lru_cache(maxsize=None)
+def _morpho_vault_v1_selector() -> bytes:
+    return bytes(Web3.keccak(text="morphoVaultV1()")[:4])
+
+
+def _pooled_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=RPC_POOL_SIZE, pool_maxsize=RPC_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 class OnchainClient:
     def __init__(self) -> None:
         self._providers: Dict[int, Web3] = {}
+        self._contracts: Dict[Tuple[int, str], Contract] = {}
+        self._multicalls: Dict[int, Contract] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=RPC_MAX_WORKERS, thread_name_prefix="onchain-rpc"
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read_chain_id(self, chain_id: int) -> Optional[int]:
+        try:
+            return self._get_web3(chain_id).eth.chain_id
+        except Exception:
+            return None
+
+    async def prewarm(self) -> None:
+        """Create each chain's provider and open its RPC connection with eth_chainId."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *[
+                loop.run_in_executor(self._executor, self._read_chain_id, chain_id)
+                for chain_id in settings.chain_configs()
+            ]
+        )
 
     def _get_web3(self, chain_id: int) -> Web3:
         if chain_id in self._providers:
@@ -32,22 +117,82 @@ class OnchainClient:
         if rpc_url.startswith("wss"):
             provider = WebsocketProvider(rpc_url)
         else:
-            provider = HTTPProvider(rpc_url)
+            provider = HTTPProvider(rpc_url, session=_pooled_session())
         web3 = Web3(provider)
         self._providers[chain_id] = web3
         return web3
 
+    def _get_adapter_contract(self, chain_id: int, adapter_address: str) -> Optional[Contract]:
+        key = (chain_id, adapter_address.lower())
+        contract = self._contracts.get(key)
+        if contract is None:
+            checksum_address = _checksum_address(adapter_address)
+            if checksum_address is None:
+                return None
+            web3 = self._get_web3(chain_id)
+            contract = web3.eth.contract(address=checksum_address, abi=METAMORPHO_ADAPTER_ABI)
+            self._contracts[key] = contract
+        return contract
+
+    def _get_multicall(self, chain_id: int) -> Contract:
+        contract = self._multicalls.get(chain_id)
+        if contract is None:
+            web3 = self._get_web3(chain_id)
+            contract = web3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+            self._multicalls[chain_id] = contract
+        return contract
+
     def _read_morpho_vault_v1(self, chain_id: int, adapter_address: str) -> Optional[str]:
-        web3 = self._get_web3(chain_id)
-        if not web3.is_address(adapter_address):
+        contract = self._get_adapter_contract(chain_id, adapter_address)
+        if contract is None:
             return None
-        contract = web3.eth.contract(
-            address=web3.to_checksum_address(adapter_address), abi=METAMORPHO_ADAPTER_ABI
-        )
         try:
             return contract.functions.morphoVaultV1().call()
         except Exception:
             return None
 
     async def fetch_morpho_vault_v1(self, chain_id: int, adapter_address: str) -> Optional[str]:
-        return await asyncio.to_thread(self._read_morpho_vault_v1, chain_id, adapter_address)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._read_morpho_vault_v1, chain_id, adapter_address
+        )
+
+    def _read_morpho_vault_v1_batch(
+        self, chain_id: int, adapter_addresses: List[str]
+    ) -> Dict[str, Optional[str]]:
+        results: Dict[str, Optional[str]] = {addr: None for addr in adapter_addresses}
+        targets = [
+            (addr, checksum_address)
+            for addr in adapter_addresses
+            if (checksum_address := _checksum_address(addr)) is not None
+        ]
+        if not targets:
+            return results
+
+        selector = _morpho_vault_v1_selector()
+        calls = [(checksum_address, True, selector) for _, checksum_address in targets]
+        responses = self._get_multicall(chain_id).functions.aggregate3(calls).call()
+        for (addr, _), (success, return_data) in zip(targets, responses):
+            # An ABI-encoded address is left-padded to 32 bytes.
+            if success and len(return_data) >= 32 and any(return_data[12:32]):
+                results[addr] = Web3.to_checksum_address(return_data[12:32])
+        return results
+
+    async def fetch_morpho_vault_v1_batch(
+        self, chain_id: int, adapter_addresses: List[str]
+    ) -> Dict[str, Optional[str]]:
+        """Resolve many adapters to their v1 vault with a single Multicall3 eth_call."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, self._read_morpho_vault_v1_batch, chain_id, adapter_addresses
+            )
+        except Exception:
+            results = await asyncio.gather(
+                *[self.fetch_morpho_vault_v1(chain_id, addr) for addr in adapter_addresses],
+                return_exceptions=True,
+            )
+            return {
+                addr: None if isinstance(result, BaseException) else result
+                for addr, result in zip(adapter_addresses, results)
+            }
@@ -1,27 +1,57 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import httpx
+import orjson
 
 from app.core.config import settings
+from app.services.cache import AsyncTTLCache
+from app.services.http import shared_async_client
 from app.services.morpho_client import safe_get, to_decimal, format_decimal
 
+ASSETS_QUERY = """
+query GetAssetsWithPrice($where: AssetsFilters) {
+  assets(where: $where) {
+    items {
+      address
+      name
+      priceUsd
+      chain {
+        id
+      }
+    }
+  }
+}
+"""
+
+ASSETS_CACHE_TTL = 60.0
+
+_MARKET_PARTS = ("for_supply", "for_borrow", "for_collateral")
+_AMOUNT_KEYS = ("claimable_now", "claimable_next")
+
+
+def _sum_claimable(reward: Dict[str, Any]) -> int:
+    # Market rewards split amounts per side; every other type carries one "amount" block.
+    if reward.get("type") == "market-reward":
+        parts = [reward.get(key) or {} for key in _MARKET_PARTS]
+    else:
+        parts = [reward.get("amount") or {}]
+    return sum(int(part.get(key) or 0) for part in parts for key in _AMOUNT_KEYS)
+
 
 class RewardsClient:
-    def __init__(self) -> None:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None) -> None:
         self._base_url = settings.rewards_base_url.rstrip("/")
-        self._client = httpx.AsyncClient(timeout=20)
-
-    async def close(self) -> None:
-        await self._client.aclose()
+        self._client = client or shared_async_client()
+        self._cache = AsyncTTLCache()
 
     async def fetch_user_rewards(self, address: str) -> List[Dict[str, Any]]:
         url = f"{self._base_url}/users/{address}/rewards"
         resp = await self._client.get(url)
         resp.raise_for_status()
-        data = resp.json()
+        data = orjson.loads(resp.content)
         if isinstance(data, dict):
             for key in ("data", "items", "rewards"):
                 if key in data and isinstance(data[key], list):
@@ -33,89 +63,61 @@ class RewardsClient:
     async def fetch_assets_metadata(
         self, rewards: List[Dict[str, Any]]
     ) -> Dict[Tuple[str, int], Dict[str, Any]]:
-        assets_by_chain: Dict[int, List[str]] = {}
+        addresses: Set[str] = set()
+        chain_ids: Set[int] = set()
         for reward in rewards:
             asset = safe_get(reward, "asset", default={}) or {}
             address = safe_get(asset, "address")
             chain_id = safe_get(asset, "chain_id")
             if not address or not chain_id:
                 continue
-            assets_by_chain.setdefault(int(chain_id), [])
-            if address not in assets_by_chain[int(chain_id)]:
-                assets_by_chain[int(chain_id)].append(address)
+            addresses.add(address)
+            chain_ids.add(int(chain_id))
 
-        if not assets_by_chain:
+        if not addresses:
             return {}
 
-        results: Dict[Tuple[str, int], Dict[str, Any]] = {}
-        query = """
-        query GetAssetsWithPrice($where: AssetsFilters) {
-          assets(where: $where) {
-            items {
-              address
-              name
-              priceUsd
-              chain {
-                id
-              }
-            }
-          }
+        # One query across all chains; items are bucketed by (address, chainId) below.
+        variables = {
+            "where": {"address_in": sorted(addresses), "chainId_in": sorted(chain_ids)}
         }
-        """
-
-        for chain_id, addresses in assets_by_chain.items():
-            variables = {"where": {"address_in": addresses, "chainId_in": [chain_id]}}
-            try:
-                resp = await self._client.post(
-                    settings.morpho_graphql_url, json={"query": query, "variables": variables}
-                )
-                resp.raise_for_status()
-                payload = resp.json()
-                items = (
-                    safe_get(safe_get(payload, "data", {}), "assets", {})
-                    .get("items", [])
-                    or []
-                )
-                for item in items:
-                    addr = safe_get(item, "address")
-                    cid = safe_get(safe_get(item, "chain", {}), "id")
-                    if addr and cid is not None:
-                        results[(addr, int(cid))] = item
-            except Exception:
-                continue
+        key = (ASSETS_QUERY, orjson.dumps(variables, option=orjson.OPT_SORT_KEYS))
+        try:
+            items = await self._cache.get_or_set(
+                key, ASSETS_CACHE_TTL, lambda: self._fetch_assets(variables)
+            )
+        except Exception:
+            return {}
 
+        results: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for item in items:
+            addr = safe_get(item, "address")
+            cid = safe_get(safe_get(item, "chain", {}), "id")
+            if addr and cid is not None:
+                results[(addr, int(cid))] = item
         return results
 
-    @staticmethod
-    def _sum_claimable(reward: Dict[str, Any]) -> int:
-        reward_type = safe_get(reward, "type")
-        total_claimable_wei = 0
-
-        if reward_type == "market-reward":
-            for part_key in ("for_supply", "for_borrow", "for_collateral"):
-                part = safe_get(reward, part_key, default=None)
-                if not part:
-                    continue
-                total_claimable_wei += int(safe_get(part, "claimable_now", 0) or 0)
-                total_claimable_wei += int(safe_get(part, "claimable_next", 0) or 0)
-        elif reward_type == "uniform-reward":
-            amount = safe_get(reward, "amount", default={})
-            total_claimable_wei += int(safe_get(amount, "claimable_now", 0) or 0)
-            total_claimable_wei += int(safe_get(amount, "claimable_next", 0) or 0)
-        else:
-            amount = safe_get(reward, "amount", default={})
-            total_claimable_wei += int(safe_get(amount, "claimable_now", 0) or 0)
-            total_claimable_wei += int(safe_get(amount, "claimable_next", 0) or 0)
-
-        return total_claimable_wei
+    async def _fetch_assets(self, variables: Dict[str, Any]) -> List[Dict[str, Any]]:
+        resp = await self._client.post(
+            settings.morpho_graphql_url, json={"query": ASSETS_QUERY, "variables": variables}
+        )
+        resp.raise_for_status()
+        payload = orjson.loads(resp.content)
+        return safe_get(safe_get(payload, "data", {}), "assets", {}).get("items", []) or []
 
     async def build_unclaimed_rewards(self, rewards: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        metadata = await self.fetch_assets_metadata(rewards)
-        results: List[Dict[str, Any]] = []
+        active: List[Tuple[Dict[str, Any], int]] = []
         for reward in rewards:
-            total_claimable_wei = self._sum_claimable(reward)
-            if total_claimable_wei == 0:
-                continue
+            total_claimable_wei = _sum_claimable(reward)
+            if total_claimable_wei != 0:
+                active.append((reward, total_claimable_wei))
+        if not active:
+            return []
+
+        # Only look up metadata for rewards that will actually be reported.
+        metadata = await self.fetch_assets_metadata([reward for reward, _ in active])
+        results: List[Dict[str, Any]] = []
+        for reward, total_claimable_wei in active:
             asset = safe_get(reward, "asset", default={}) or {}
             address = safe_get(asset, "address")
             chain_id = safe_get(asset, "chain_id")
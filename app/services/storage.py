@@ -1,22 +1,42 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import WriteConcern
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_QUEUE_SIZE = 1000
+SNAPSHOT_BATCH_SIZE = 100
+SNAPSHOT_BATCH_WINDOW = 0.05
+
+
+_ts_prefix: Tuple[int, str] = (-1, "")
+
 
 def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    global _ts_prefix
+    seconds, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached = _ts_prefix
+    if cached[0] != seconds:
+        cached = (seconds, time.strftime("%Y-%m-%dT%H:%M:%S.", time.gmtime(seconds)))
+        _ts_prefix = cached
+    return f"{cached[1]}{micros:06d}Z"
 
 
 class MongoStorage:
     def __init__(self) -> None:
         self._client: Optional[AsyncIOMotorClient] = None
         self._db = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._snapshot_collections: Dict[str, AsyncIOMotorCollection] = {}
 
     def _get_client(self) -> Optional[AsyncIOMotorClient]:
         if not settings.mongo_enabled:
@@ -26,23 +46,81 @@ class MongoStorage:
             self._db = self._client[settings.mongo_db]
         return self._client
 
+    def start(self) -> None:
+        if not settings.mongo_enabled or self._writer is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+        self._writer = asyncio.create_task(self._snapshot_writer())
+
     async def close(self) -> None:
+        if self._writer is not None:
+            # The sentinel lets the writer finish the batch it holds before exiting.
+            if not self._writer.done():
+                await self._queue.put(None)
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+            await self._write_batch([item for item in self._drain() if item is not None])
         if self._client is not None:
             self._client.close()
 
-    async def save_snapshot(self, collection: str, payload: Dict[str, Any]) -> None:
-        if not settings.mongo_enabled:
+    def _drain(self, limit: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        while self._queue is not None and not self._queue.empty():
+            if limit is not None and len(batch) >= limit:
+                break
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _snapshot_writer(self) -> None:
+        queue = self._queue
+        if queue is None:
+            return
+        stopping = False
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            if queue.empty():
+                # Give concurrent requests a short window to join this batch.
+                await asyncio.sleep(SNAPSHOT_BATCH_WINDOW)
+            rest = self._drain(SNAPSHOT_BATCH_SIZE - 1)
+            if None in rest:
+                stopping = True
+                rest = rest[: rest.index(None)]
+            batch.extend(rest)
+            await self._write_batch(batch)
+
+    def _snapshot_collection(self, name: str) -> AsyncIOMotorCollection:
+        # Snapshots are fire-and-forget, so batched writes skip acknowledgement.
+        collection = self._snapshot_collections.get(name)
+        if collection is None:
+            collection = self._db[name].with_options(write_concern=WriteConcern(w=0))
+            self._snapshot_collections[name] = collection
+        return collection
+
+    async def _write_batch(self, batch: List[Tuple[str, Dict[str, Any]]]) -> None:
+        if not batch:
             return
         self._get_client()
         if self._db is None:
             return
-        doc = {"createdAt": _now_iso(), **payload}
-        try:
-            await self._db[collection].insert_one(doc)
-        except Exception:
-            pass
+        docs_by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for collection, doc in batch:
+            docs_by_collection.setdefault(collection, []).append(doc)
+        for collection, docs in docs_by_collection.items():
+            try:
+                await self._snapshot_collection(collection).insert_many(docs, ordered=False)
+            except Exception:
+                pass
 
     def save_snapshot_background(self, collection: str, payload: Dict[str, Any]) -> None:
         if not settings.mongo_enabled:
             return
-        asyncio.create_task(self.save_snapshot(collection, payload))
+        self.start()
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait((collection, {"createdAt": _now_iso(), **payload}))
+        except asyncio.QueueFull:
+            logger.warning("Snapshot queue full, dropping %s snapshot", collection)